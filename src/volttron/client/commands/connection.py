@@ -31,6 +31,9 @@ from volttron.client.vip.agent import Agent as BaseAgent
 
 _log = logging.getLogger(__name__)
 
+# Seconds to wait for the result of an rpc call made through a ControlConnection.
+CALL_TIMEOUT = 20
+
 
 class ControlConnection(object):
 
@@ -60,7 +63,8 @@ class ControlConnection(object):
         _log.debug(f"Calling {self.peer} method: {method} with args {args}")
         assert self.server
         assert self.server.vip.rpc
-        return self.server.vip.rpc.call(self.peer, method, *args, **kwargs).get(timeout=20)
+        result = self.server.vip.rpc.call(self.peer, method, *args, **kwargs)
+        return result.get(timeout=CALL_TIMEOUT)
 
     def call_no_get(self, method, *args, **kwargs):
         return self.server.vip.rpc.call(self.peer, method, *args, **kwargs)
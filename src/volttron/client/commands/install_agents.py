@@ -23,11 +23,12 @@
 # }}}
 
 import base64
-import glob
 import hashlib
 import logging
 import os
+import pickle
 import shutil
+import stat
 from pathlib import Path
 import sys
 import tempfile
@@ -35,6 +36,7 @@ import tempfile
 import gevent
 import yaml
 
+from volttron.client.commands.connection import CALL_TIMEOUT
 from volttron.client.vip.agent.results import AsyncResult
 
 from volttron.utils import (
@@ -55,6 +57,13 @@ _log = logging.getLogger(__name__)
 _stdout = sys.stdout
 _stderr = sys.stderr
 
+# Prefer the libyaml backed loader when PyYAML was built against it.
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+_URL_SCHEMES = frozenset({"http", "https", "git", "git+https", "git+ssh", "file"})
+
+_BUILD_OUTPUT_DIRS = frozenset({"dist", "build"})
+
 
 def install_requirements(agent_source):
     req_file = os.path.join(agent_source, "requirements.txt")
@@ -68,38 +77,111 @@ def install_requirements(agent_source):
             sys.exit(1)
 
 
-def install_agent_directory(opts, publickey=None, secretkey=None):
+def _newest_wheel(dist_path):
     """
-    The main installation method for installing the agent on the correct local
-    platform instance.
-    :param opts:
-    :param package:
-    :param agent_config:
-    :return:
+    Return a tuple of (path, mtime) for the most recently modified wheel in dist_path
+    or (None, 0.0) if there is no wheel or dist_path does not exist.
+    """
+    newest = None
+    newest_mtime = 0.0
+    try:
+        with os.scandir(dist_path) as it:
+            for entry in it:
+                if not entry.name.endswith(".whl"):
+                    continue
+                mtime = entry.stat().st_mtime
+                if newest is None or mtime > newest_mtime:
+                    newest, newest_mtime = entry.path, mtime
+    except FileNotFoundError:
+        pass
+    return newest, newest_mtime
+
+
+def _newest_source_mtime(path, top_level=True):
+    """
+    Return the newest modification time of path and the files and directories under it.
+
+    Directory mtimes are included so removed or renamed files count as changes. Hidden
+    entries and __pycache__ are skipped at any depth, build output (dist, build and
+    *.egg-info) only when directly under the top level path.  Symlinks are not followed.
+    """
+    newest = os.stat(path).st_mtime if top_level else 0.0
+    with os.scandir(path) as it:
+        for entry in it:
+            name = entry.name
+            if name.startswith(".") or name == "__pycache__":
+                continue
+            if top_level and (name in _BUILD_OUTPUT_DIRS or name.endswith(".egg-info")):
+                continue
+            try:
+                newest = max(newest, entry.stat(follow_symlinks=False).st_mtime)
+                if entry.is_dir(follow_symlinks=False):
+                    newest = max(newest, _newest_source_mtime(entry.path, top_level=False))
+            except OSError:
+                # Removed while walking the tree, the parent directory mtime covers it.
+                continue
+    return newest
+
+
+def _find_up_to_date_wheel(install_path, dist_path):
+    """
+    Return the newest wheel in dist_path if it was built after the last change to the
+    sources in install_path, otherwise None.
+    """
+    wheel, wheel_mtime = _newest_wheel(dist_path)
+    if wheel is None or wheel_mtime <= _newest_source_mtime(install_path):
+        return None
+    return wheel
+
+
+def _build_agent_wheel(install_path, dist_path):
+    """
+    Build a wheel from the agent source in install_path and return the path to it.
     """
-    dist_path = os.path.abspath(os.path.join(opts.install_path, "dist"))
     # if dist directory exists remove it might have older versions of wheel
     if os.path.isdir(dist_path):
         shutil.rmtree(dist_path)
-    if os.path.isfile(os.path.join(opts.install_path, "setup.py")):
-        if os.path.isfile(os.path.join(opts.install_path, "Pipfile")):
+    if os.path.isfile(os.path.join(install_path, "setup.py")):
+        if os.path.isfile(os.path.join(install_path, "Pipfile")):
             cmd = ["pipenv", "run", "python3", "setup.py", "bdist_wheel"]
         else:
             cmd = ["python3", "setup.py", "bdist_wheel"]
-    elif os.path.isfile(os.path.join(opts.install_path, "pyproject.toml")):
+    elif os.path.isfile(os.path.join(install_path, "pyproject.toml")):
         cmd = ["poetry", "build"]
     else:
         raise InstallRuntimeError(
-            f"Unable to build file. No setup.py or poetry.lock file exists in {opts.install_path}")
-    output = execute_command(cmd, cwd=opts.install_path)
+            f"Unable to build file. No setup.py or poetry.lock file exists in {install_path}")
+    output = execute_command(cmd, cwd=install_path)
     # wheel should be in dist dir
-    match = glob.glob(os.path.join(dist_path, "*.whl"))
-    if match:
-        opts.package = match[0]
-    else:
+    wheel, _ = _newest_wheel(dist_path)
+    if wheel is None:
         raise InstallRuntimeError(
             f"No .whl file found in {dist_path} after running command {' '.join(cmd)}. "
             f"\nCommand returned stdout:\n{output}")
+    return wheel
+
+
+def install_agent_directory(opts, publickey=None, secretkey=None, agent_path=None):
+    """
+    The main installation method for installing the agent on the correct local
+    platform instance.
+    :param opts:
+    :param package:
+    :param agent_config:
+    :param agent_path: absolute path to the agent directory, defaults to opts.install_path
+    :return:
+    """
+    if agent_path is None:
+        agent_path = os.path.abspath(opts.install_path)
+    dist_path = os.path.join(agent_path, "dist")
+    wheel = None
+    if not getattr(opts, "rebuild", False):
+        wheel = _find_up_to_date_wheel(agent_path, dist_path)
+    if wheel is not None:
+        _log.info(f"Reusing {wheel}, it is newer than the sources in {agent_path}")
+        opts.package = wheel
+    else:
+        opts.package = _build_agent_wheel(agent_path, dist_path)
 
     # TODO: does pipenv handle this. Does whl contain requirements.txt
     # assert opts.connection, "Connection must have been created to access this feature."
@@ -110,6 +192,65 @@ def install_agent_directory(opts, publickey=None, secretkey=None):
     _send_and_intialize_agent(opts, publickey, secretkey)
 
 
+def _config_cache_key(config_stat):
+    """
+    Return the (st_mtime_ns, st_size) of a config file stat used to match a config cache.
+    """
+    return config_stat.st_mtime_ns, config_stat.st_size
+
+
+def _write_config_cache(cache_file, config_key, config_dict):
+    """
+    Pickle config_key and config_dict to a temporary file next to cache_file and move it
+    into place so an interrupted write never leaves a truncated cache behind.
+    """
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(cache_file) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            pickle.dump((config_key, config_dict), fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except BaseException:
+        os.unlink(tmp_file)
+        raise
+
+
+def _load_config_file(config_file, use_cache=False):
+    """
+    Load a yaml agent config file.
+
+    When use_cache is True the parsed config is pickled next to config_file along with the
+    mtime and size config_file had before it was parsed.  The pickle is loaded instead of
+    parsing the yaml only while config_file still has exactly that mtime and size.
+    Loading a pickle can run arbitrary code, so a cache that is not owned by the current
+    user is ignored; anyone who can write to the config directory can still replace it.
+    An unreadable or corrupt cache falls back to parsing the yaml.
+    """
+    cache_file = f"{config_file}.pickle"
+    if use_cache:
+        # Stat before reading so an edit made while parsing leaves a cache that never matches.
+        config_key = _config_cache_key(os.stat(config_file))
+        try:
+            if os.stat(cache_file).st_uid == os.getuid():
+                with open(cache_file, "rb") as fp:
+                    cached_key, cached_config = pickle.load(fp)
+                if cached_key == config_key:
+                    return cached_config
+        except FileNotFoundError:
+            pass
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError) as exc:
+            _log.warning(f"Ignoring unreadable config cache {cache_file}: {exc}")
+
+    with open(config_file) as fp:
+        config_dict = yaml.load(fp, Loader=_YamlLoader)
+
+    if use_cache:
+        try:
+            _write_config_cache(cache_file, config_key, config_dict)
+        except OSError as exc:
+            _log.warning(f"Unable to write config cache {cache_file}: {exc}")
+    return config_dict
+
+
 def _send_and_intialize_agent(opts, publickey, secretkey):
 
     # Verify and load agent_config up from the opts.  agent_config will
@@ -118,22 +259,18 @@ def _send_and_intialize_agent(opts, publickey, secretkey):
     if agent_config is None:
         agent_config = {}
 
-    # if not a dict then config should be a filename
-    if not isinstance(agent_config, dict):
+    # A dict can be sent as is, otherwise config should be a filename.
+    if isinstance(agent_config, dict):
+        config_dict = agent_config
+    else:
         config_file = agent_config
         if not Path(config_file).exists():
             raise InstallRuntimeError(f"Config file {config_file} does not exist!")
-    else:
-        cfg = tempfile.NamedTemporaryFile()
-        with open(cfg.name, "w") as fout:
-            fout.write(yaml.safe_dump(agent_config))
-        config_file = cfg.name
 
-    try:
-        with open(config_file) as fp:
-            config_dict = yaml.safe_load(fp)
-    except Exception as exc:
-        raise InstallRuntimeError(exc)
+        try:
+            config_dict = _load_config_file(config_file, getattr(opts, "cache_config", False))
+        except Exception as exc:
+            raise InstallRuntimeError(exc)
 
     agent_uuid = send_agent(
         opts.connection,
@@ -154,9 +291,11 @@ def _send_and_intialize_agent(opts, publickey, secretkey):
 
     output_dict = dict(agent_uuid=agent_uuid)
 
+    # tag and priority are independent so send both before waiting on either.
+    pending = []
     if opts.tag:
         _log.debug(f"Tagging agent {agent_uuid}, {opts.tag}")
-        opts.connection.call("tag_agent", agent_uuid, opts.tag)
+        pending.append(opts.connection.call_no_get("tag_agent", agent_uuid, opts.tag))
         output_dict["tag"] = opts.tag
 
     if opts.enable or opts.priority != -1:
@@ -166,7 +305,11 @@ def _send_and_intialize_agent(opts, publickey, secretkey):
         _log.debug(f"Prioritinzing agent {agent_uuid},{opts.priority}")
         output_dict["priority"] = opts.priority
 
-        opts.connection.call("prioritize_agent", agent_uuid, str(opts.priority))
+        pending.append(
+            opts.connection.call_no_get("prioritize_agent", agent_uuid, str(opts.priority)))
+
+    for result in pending:
+        result.get(timeout=CALL_TIMEOUT)
 
     try:
 
@@ -196,18 +339,38 @@ def _send_and_intialize_agent(opts, publickey, secretkey):
         else:
             sys.stdout.write(f"Agent {agent_uuid} installed\n")
     if opts.csv:
-        keylen = len(output_dict)
-        keyline = ""
-        valueline = ""
-        keys = list(output_dict.keys())
-        for k in range(keylen):
-            if k < keylen - 1:
-                keyline += "%s," % keys[k]
-                valueline += "%s," % output_dict[keys[k]]
-            else:
-                keyline += "%s" % keys[k]
-                valueline += "%s" % output_dict[keys[k]]
-        sys.stdout.write("%s\n%s\n" % (keyline, valueline))
+        keyline = ",".join(output_dict)
+        valueline = ",".join(str(v) for v in output_dict.values())
+        sys.stdout.write(f"{keyline}\n{valueline}\n")
+
+
+def _classify_install_source(source: str) -> tuple[str, str]:
+    """
+    Classify the source passed to the install sub-parser.
+
+    Returns a tuple of (source_type, processed_source) where source_type is one of
+    ``directory``, ``wheel`` or ``pypi``.  Anything that is not a local directory or
+    wheel file is passed through to the server to be installed with pip.
+    """
+    # pip urls (git+https://..., https://...) never name a local file so skip the
+    # filesystem checks for them. Wheel urls cannot be streamed to the server and
+    # fall through to the local wheel check below.
+    head, _, _ = source.partition(":")
+    if head.lower() in _URL_SCHEMES and not source.endswith(".whl"):
+        return "pypi", source
+
+    try:
+        mode = os.stat(source).st_mode
+    except OSError:
+        mode = 0
+
+    if stat.S_ISDIR(mode):
+        return "directory", os.path.abspath(source)
+    if source.endswith(".whl"):
+        if not stat.S_ISREG(mode):
+            raise InstallRuntimeError(f"Invalid wheel file {source}")
+        return "wheel", source
+    return "pypi", source
 
 
 def install_agent_vctl(opts, publickey=None, secretkey=None, callback=None):
@@ -220,14 +383,14 @@ def install_agent_vctl(opts, publickey=None, secretkey=None, callback=None):
     except AttributeError:
         install_path = opts.wheel
 
-    if os.path.isdir(install_path):
-        install_agent_directory(opts, publickey, secretkey)
+    source_type, processed_source = _classify_install_source(install_path)
+
+    if source_type == "directory":
+        install_agent_directory(opts, publickey, secretkey, agent_path=processed_source)
         if opts.connection is not None:
             opts.connection.kill()
     else:
-        if install_path.endswith(".whl") and not os.path.isfile(install_path):
-            raise InstallRuntimeError(f"Invalid wheel file {install_path}")
-        opts.package = opts.install_path
+        opts.package = processed_source
         _send_and_intialize_agent(opts, publickey, secretkey)
 
 
@@ -508,6 +671,12 @@ def add_install_agent_parser(add_parser_fn):
         "install_path",
         help="path to agent wheel or directory for agent installation",
     )
+    install.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="rebuild the agent wheel when installing from a directory even if dist/ holds a "
+        "wheel newer than the agent source",
+    )
     install.add_argument("--tag", help="tag for the installed agent")
     install.add_argument(
         "--vip-identity",
@@ -515,6 +684,13 @@ def add_install_agent_parser(add_parser_fn):
         "Overrides any previously configured VIP IDENTITY.",
     )
     install.add_argument("--agent-config", help="Agent configuration!")
+    install.add_argument(
+        "--cache-config",
+        action="store_true",
+        help="cache the parsed --agent-config file next to it as <config>.pickle and reuse it "
+        "while the file is unchanged. The cache is loaded with pickle, so anyone who can write "
+        "to the config directory can run code as the vctl user",
+    )
     install.add_argument(
         "-f",
         "--force",
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*- {{{
+# ===----------------------------------------------------------------------===
+#
+#                 Installable Component of Eclipse VOLTTRON
+#
+# ===----------------------------------------------------------------------===
+#
+# Copyright 2022 Battelle Memorial Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy
+# of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+#
+# ===----------------------------------------------------------------------===
+# }}}
+
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock, call
+
+import pytest
+
+from volttron.client.commands import install_agents
+from volttron.client.commands.connection import CALL_TIMEOUT
+
+OLD = 1_000_000
+NEW = 2_000_000
+
+
+def _set_tree_mtime(root, mtime):
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        for name in filenames + dirnames:
+            os.utime(os.path.join(dirpath, name), (mtime, mtime), follow_symlinks=False)
+    os.utime(root, (mtime, mtime))
+
+
+@pytest.fixture
+def agent_tree(tmp_path):
+    """An agent source tree last changed at OLD with a wheel in dist/ built at NEW."""
+    package = tmp_path / "src" / "agent"
+    package.mkdir(parents=True)
+    (tmp_path / "pyproject.toml").write_text("[tool.poetry]\n")
+    (package / "__init__.py").write_text("")
+    (package / "old.py").write_text("")
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    wheel = dist / "agent-0.1.0-py3-none-any.whl"
+    wheel.write_bytes(b"")
+    _set_tree_mtime(tmp_path, OLD)
+    os.utime(wheel, (NEW, NEW))
+    return tmp_path, str(dist), str(wheel)
+
+
+def test_up_to_date_wheel_is_reused(agent_tree):
+    install_path, dist_path, wheel = agent_tree
+    assert install_agents._find_up_to_date_wheel(install_path, dist_path) == wheel
+
+
+def test_missing_dist_is_not_up_to_date(tmp_path):
+    (tmp_path / "pyproject.toml").write_text("")
+    assert install_agents._find_up_to_date_wheel(tmp_path, str(tmp_path / "dist")) is None
+
+
+def test_edited_source_rebuilds(agent_tree):
+    install_path, dist_path, _ = agent_tree
+    old_py = install_path / "src" / "agent" / "old.py"
+    os.utime(old_py, (NEW + 1, NEW + 1))
+    assert install_agents._find_up_to_date_wheel(install_path, dist_path) is None
+
+
+def test_deleted_source_rebuilds(agent_tree):
+    install_path, dist_path, _ = agent_tree
+    os.remove(install_path / "src" / "agent" / "old.py")
+    assert install_agents._find_up_to_date_wheel(install_path, dist_path) is None
+
+
+def test_nested_build_directory_is_source(agent_tree):
+    install_path, dist_path, _ = agent_tree
+    nested = install_path / "src" / "agent" / "build"
+    nested.mkdir()
+    (nested / "helpers.py").write_text("")
+    _set_tree_mtime(install_path / "src", OLD)
+    os.utime(nested / "helpers.py", (NEW + 1, NEW + 1))
+    assert install_agents._find_up_to_date_wheel(install_path, dist_path) is None
+
+
+def test_top_level_build_output_is_ignored(agent_tree):
+    install_path, dist_path, wheel = agent_tree
+    for name in ("build", "agent.egg-info"):
+        output = install_path / name
+        output.mkdir()
+        (output / "PKG-INFO").write_text("")
+        os.utime(output / "PKG-INFO", (NEW + 1, NEW + 1))
+        os.utime(output, (NEW + 1, NEW + 1))
+    os.utime(install_path, (OLD, OLD))
+    assert install_agents._find_up_to_date_wheel(install_path, dist_path) == wheel
+
+
+def test_dangling_symlink_does_not_raise(agent_tree):
+    install_path, dist_path, wheel = agent_tree
+    os.symlink(install_path / "missing", install_path / "src" / "agent" / "lock")
+    _set_tree_mtime(install_path / "src", OLD)
+    assert install_agents._find_up_to_date_wheel(install_path, dist_path) == wheel
+
+
+@pytest.mark.parametrize("rebuild", [False, True])
+def test_rebuild_skips_up_to_date_wheel(agent_tree, monkeypatch, rebuild):
+    install_path, _, wheel = agent_tree
+    built = str(install_path / "dist" / "agent-0.2.0-py3-none-any.whl")
+    monkeypatch.setattr(install_agents, "_build_agent_wheel", lambda *args: built)
+    monkeypatch.setattr(install_agents, "_send_and_intialize_agent", lambda *args: None)
+    opts = SimpleNamespace(install_path=str(install_path), rebuild=rebuild, package=None)
+
+    install_agents.install_agent_directory(opts)
+
+    assert opts.package == (built if rebuild else wheel)
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    config = tmp_path / "config.yml"
+    config.write_text("setting: 1\n")
+    os.utime(config, (OLD, OLD))
+    return str(config)
+
+
+def test_config_cache_hit_skips_yaml(config_file, monkeypatch):
+    assert install_agents._load_config_file(config_file, use_cache=True) == {"setting": 1}
+
+    def fail(*args, **kwargs):
+        raise AssertionError("yaml should not be parsed")
+
+    monkeypatch.setattr(install_agents.yaml, "load", fail)
+    assert install_agents._load_config_file(config_file, use_cache=True) == {"setting": 1}
+
+
+def test_config_cache_invalidated_by_newer_config(config_file):
+    install_agents._load_config_file(config_file, use_cache=True)
+    with open(config_file, "w") as fp:
+        fp.write("setting: 2\n")
+    newer = os.path.getmtime(f"{config_file}.pickle") + 10
+    os.utime(config_file, (newer, newer))
+
+    assert install_agents._load_config_file(config_file, use_cache=True) == {"setting": 2}
+
+
+def test_config_edited_while_parsing_is_not_served_from_cache(config_file, monkeypatch):
+    write_config_cache = install_agents._write_config_cache
+
+    def edit_then_write(*args):
+        # Simulate the config being saved after it was parsed but before the cache write.
+        with open(config_file, "w") as fp:
+            fp.write("setting: 2\n")
+        write_config_cache(*args)
+
+    monkeypatch.setattr(install_agents, "_write_config_cache", edit_then_write)
+    assert install_agents._load_config_file(config_file, use_cache=True) == {"setting": 1}
+    monkeypatch.setattr(install_agents, "_write_config_cache", write_config_cache)
+
+    assert install_agents._load_config_file(config_file, use_cache=True) == {"setting": 2}
+
+
+@pytest.mark.parametrize("contents", [b"", b"\x80\x05\x95\x10"])
+def test_corrupt_config_cache_falls_back_to_yaml(config_file, contents):
+    cache_file = f"{config_file}.pickle"
+    with open(cache_file, "wb") as fp:
+        fp.write(contents)
+
+    assert install_agents._load_config_file(config_file, use_cache=True) == {"setting": 1}
+    # The cache is rewritten with the parsed config.
+    assert install_agents._load_config_file(config_file, use_cache=True) == {"setting": 1}
+    assert os.path.getsize(cache_file) > len(contents)
+
+
+def test_config_cache_owned_by_other_user_is_ignored(config_file, monkeypatch):
+    cache_file = f"{config_file}.pickle"
+    config_key = install_agents._config_cache_key(os.stat(config_file))
+    install_agents._write_config_cache(cache_file, config_key, {"setting": "cached"})
+    monkeypatch.setattr(install_agents.os, "getuid", lambda: os.stat(cache_file).st_uid + 1)
+
+    assert install_agents._load_config_file(config_file, use_cache=True) == {"setting": 1}
+
+
+def test_classify_install_source(tmp_path):
+    wheel = tmp_path / "agent-0.1.0-py3-none-any.whl"
+    wheel.write_bytes(b"")
+
+    assert install_agents._classify_install_source(str(tmp_path)) == ("directory", str(tmp_path))
+    assert install_agents._classify_install_source(str(wheel)) == ("wheel", str(wheel))
+    package = "volttron-listener"
+    assert install_agents._classify_install_source(package) == ("pypi", package)
+    url = "git+https://github.com/eclipse-volttron/volttron-listener"
+    assert install_agents._classify_install_source(url) == ("pypi", url)
+    with pytest.raises(install_agents.InstallRuntimeError):
+        install_agents._classify_install_source(str(tmp_path / "missing.whl"))
+    with pytest.raises(install_agents.InstallRuntimeError):
+        install_agents._classify_install_source("https://example.com/agent.whl")
+
+
+def _install_opts(connection):
+    return SimpleNamespace(agent_config=None,
+                           connection=connection,
+                           package="volttron-listener",
+                           vip_identity=None,
+                           force=False,
+                           pre_release=False,
+                           tag="listener",
+                           enable=False,
+                           priority=60,
+                           start=False,
+                           json=False,
+                           csv=False)
+
+
+def test_tag_and_priority_rpcs_are_sent_before_waiting(monkeypatch, capsys):
+    monkeypatch.setattr(install_agents, "send_agent", lambda *args: "agent-uuid")
+    connection = MagicMock()
+    connection.call_no_get.side_effect = lambda method, *args: getattr(connection, method)
+
+    install_agents._send_and_intialize_agent(_install_opts(connection), None, None)
+
+    assert connection.mock_calls == [
+        call.call_no_get("tag_agent", "agent-uuid", "listener"),
+        call.call_no_get("prioritize_agent", "agent-uuid", "60"),
+        call.tag_agent.get(timeout=CALL_TIMEOUT),
+        call.prioritize_agent.get(timeout=CALL_TIMEOUT),
+    ]
+    assert "Agent agent-uuid installed" in capsys.readouterr().out
+
+
+def test_tag_and_priority_rpc_error_propagates(monkeypatch):
+    monkeypatch.setattr(install_agents, "send_agent", lambda *args: "agent-uuid")
+    connection = MagicMock()
+    connection.call_no_get.side_effect = lambda method, *args: getattr(connection, method)
+    connection.prioritize_agent.get.side_effect = RuntimeError("prioritize failed")
+
+    with pytest.raises(RuntimeError, match="prioritize failed"):
+        install_agents._send_and_intialize_agent(_install_opts(connection), None, None)